@@ -0,0 +1,128 @@
+"""
+Módulo responsável pelo cache persistente (em disco) das agregações do dashboard.
+
+O @st.cache_data vive apenas em memória, então após cada deploy ou reinício
+do Streamlit os primeiros acessos pagam pela leitura do CSV e por todos os
+groupby do data_handler. Este script contém funções para:
+- Calcular a versão do dataset (hash do conteúdo do CSV).
+- Pré-calcular as agregações da visão padrão da barra lateral (todas as
+  organizações, intervalo completo de anos, Top N padrão) e das visões
+  individuais de cada organização.
+- Gravar e ler esse cache em disco, descartando-o se o CSV tiver mudado.
+
+Pode ser executado diretamente (a partir de src/) para pré-aquecer o cache:
+    python aggregate_cache.py
+
+"""
+# --- IMPORTS ---
+
+import os
+import hashlib
+import logging
+import pickle
+import pandas as pd
+import data_handler
+
+# --- CONSTANTES ---
+
+TOP_N_DEFAULT = 10
+CACHE_FORMAT_VERSION = 1 #! incrementar ao mudar a estrutura do cache
+
+# --- FUNÇÕES AUXILIARES ---
+
+def get_cache_file(csv_file=data_handler.CSV_FILE):
+    """Retorna o caminho do arquivo de cache associado a um CSV (gravado ao lado dele)."""
+    return f"{os.path.splitext(csv_file)[0]}_aggregates.pkl"
+
+def get_dataset_version(csv_file=data_handler.CSV_FILE):
+    """Calcula a versão do dataset a partir do hash do conteúdo do CSV."""
+    sha = hashlib.sha256()
+    with open(csv_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return f"{CACHE_FORMAT_VERSION}-{sha.hexdigest()}"
+
+def make_view_key(selected_orgs, selected_years, top_n):
+    """Gera a chave de uma visão do dashboard (independente da ordem das organizações)."""
+    return (tuple(sorted(selected_orgs)), (int(selected_years[0]), int(selected_years[1])), int(top_n))
+
+def make_org_key(org, selected_years, top_n):
+    """Gera a chave dos detalhes de UMA organização (aba 'Organizações')."""
+    return (org, (int(selected_years[0]), int(selected_years[1])), int(top_n))
+
+# --- FUNÇÕES DE AGREGAÇÃO ---
+
+def compute_view_aggregates(df_filtered, top_n):
+    """Calcula todas as agregações usadas pelas abas para um DataFrame filtrado."""
+    df_top_langs = data_handler.get_top_languages_overall(df_filtered, top_n)
+    top_n_lang_names = df_top_langs['Language'].tolist() if not df_top_langs.empty else []
+    return {
+        'kpis': data_handler.get_kpi_metrics(df_filtered),
+        'top_languages': df_top_langs,
+        'bytes_per_org': data_handler.get_bytes_per_org(df_filtered),
+        'bytes_per_year': data_handler.get_bytes_per_year(df_filtered),
+        'language_trends': data_handler.get_language_trends_over_time(df_filtered, top_n_lang_names),
+    }
+
+def compute_org_aggregates(df_org, top_n):
+    """Calcula as agregações dos detalhes de UMA organização."""
+    return {
+        'bytes_per_year': data_handler.get_org_bytes_per_year(df_org),
+        'top_languages': data_handler.get_top_languages_for_org(df_org, top_n),
+    }
+
+# --- FUNÇÕES DE LEITURA E ESCRITA ---
+
+def build_cache(csv_file=data_handler.CSV_FILE, top_n=TOP_N_DEFAULT):
+    """
+    Lê o CSV, pré-calcula as agregações da visão padrão e das visões por
+    organização e grava o cache em disco. Retorna o caminho do arquivo gerado.
+    """
+    version = get_dataset_version(csv_file)
+    df = data_handler.prepare_data(pd.read_csv(csv_file))
+
+    all_orgs = sorted(df['Organization'].unique())
+    years = (int(df['Year'].min()), int(df['Year'].max()))
+
+    views = {}
+    orgs = {}
+    # visão padrão: todas as organizações, todos os anos
+    views[make_view_key(all_orgs, years, top_n)] = compute_view_aggregates(df, top_n)
+    # visões por organização (seleção individual e detalhes da aba 'Organizações')
+    for org in all_orgs:
+        df_org = df[df['Organization'] == org]
+        views[make_view_key([org], years, top_n)] = compute_view_aggregates(df_org, top_n)
+        orgs[make_org_key(org, years, top_n)] = compute_org_aggregates(df_org, top_n)
+
+    cache = {'version': version, 'df': df, 'views': views, 'orgs': orgs}
+    cache_file = get_cache_file(csv_file)
+    tmp_file = f"{cache_file}.tmp"
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache_file) # escrita atômica para não deixar cache corrompido
+    logging.info(f"Cache de agregações salvo em {cache_file} ({len(views)} visões, {len(orgs)} organizações)")
+    return cache_file
+
+def load_cache(csv_file=data_handler.CSV_FILE):
+    """
+    Lê o cache do disco. Retorna None se ele não existir, estiver corrompido
+    ou tiver sido gerado para outra versão do dataset.
+    """
+    cache_file = get_cache_file(csv_file)
+    if not os.path.exists(cache_file) or not os.path.exists(csv_file):
+        return None
+    try:
+        with open(cache_file, 'rb') as f:
+            cache = pickle.load(f)
+        if cache.get('version') != get_dataset_version(csv_file):
+            logging.info(f"Cache {cache_file} desatualizado em relação ao CSV. Ignorando.")
+            return None
+        return cache
+    except Exception as e:
+        logging.warning(f"Não foi possível ler o cache {cache_file}: {e}")
+        return None
+
+# --- EXECUÇÃO DIRETA ---
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    build_cache()
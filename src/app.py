@@ -14,6 +14,14 @@ import streamlit as st
 import pandas as pd
 import data_handler       
 import visualizations     
+import aggregate_cache
+
+# --- CACHE PERSISTENTE ---
+
+@st.cache_resource
+def load_warm_cache():
+    """Carrega (uma vez por processo) o cache de agregações pré-calculado em disco."""
+    return aggregate_cache.load_cache()
 
 # --- CLASSE PRINCIPAL ---
 
@@ -24,9 +32,11 @@ class DashboardApp:
     """
     def __init__(self):
         """Inicializa a aplicação."""
-        self.TOP_N_DEFAULT = 10
+        self.TOP_N_DEFAULT = aggregate_cache.TOP_N_DEFAULT
         self.df_full = None
         self.df_filtered = pd.DataFrame() # inicia vazio
+        self.warm_cache = None
+        self.view_cache = None # agregações pré-calculadas da visão atual, se houver
 
     def _setup_page(self):
         """Configura as definições iniciais da página Streamlit."""
@@ -71,7 +81,11 @@ class DashboardApp:
         """, unsafe_allow_html=True)
 
     def _load_initial_data(self):
-        """Carrega os dados iniciais usando o data_handler."""
+        """Carrega os dados iniciais do cache persistente ou, se indisponível, usando o data_handler."""
+        self.warm_cache = load_warm_cache()
+        if self.warm_cache is not None:
+            self.df_full = self.warm_cache['df']
+            return
         self.df_full = data_handler.load_data() 
         if self.df_full is None:
             st.error("❌ Falha no carregamento dos dados iniciais. Verifique o console e a existência do arquivo CSV.")
@@ -121,10 +135,24 @@ class DashboardApp:
 
         return selected_orgs_sb, selected_years_sb, top_n_sb
 
+    def _get_view_aggregate(self, name, func, *args):
+        """Retorna a agregação da visão atual a partir do cache persistente ou calcula com o data_handler."""
+        if self.view_cache is not None:
+            return self.view_cache[name]
+        return func(*args)
+
+    def _get_org_aggregate(self, org_name, selected_years, top_n, name, func, *args):
+        """Retorna a agregação de UMA organização a partir do cache persistente ou calcula com o data_handler."""
+        if self.warm_cache is not None:
+            org_cache = self.warm_cache['orgs'].get(aggregate_cache.make_org_key(org_name, selected_years, top_n))
+            if org_cache is not None:
+                return org_cache[name]
+        return func(*args)
+
     def _render_kpis(self):
         """Renderiza os Key Performance Indicators (KPIs) no topo."""
         kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
-        total_bytes, num_orgs_filtered, num_langs = data_handler.get_kpi_metrics(self.df_filtered)
+        total_bytes, num_orgs_filtered, num_langs = self._get_view_aggregate('kpis', data_handler.get_kpi_metrics, self.df_filtered)
 
         with kpi_col1:
             st.metric("Volume Total de Código", f"{total_bytes / 1e9:.2f} GB")
@@ -164,7 +192,7 @@ class DashboardApp:
         st.header("Visão Geral de Linguagens")
 
         # Gráfico: Top N Linguagens Geral
-        df_top_langs = data_handler.get_top_languages_overall(self.df_filtered, top_n)
+        df_top_langs = self._get_view_aggregate('top_languages', data_handler.get_top_languages_overall, self.df_filtered, top_n)
         fig_overall_langs = visualizations.plot_top_languages_overall(df_top_langs, top_n)
         if fig_overall_langs:
             st.plotly_chart(fig_overall_langs, use_container_width=True)
@@ -173,7 +201,7 @@ class DashboardApp:
 
         # Gráfico: Comparativo de Bytes Totais por Organização
         st.subheader("Volume em Bytes por Organização")
-        df_org_bytes = data_handler.get_bytes_per_org(self.df_filtered)
+        df_org_bytes = self._get_view_aggregate('bytes_per_org', data_handler.get_bytes_per_org, self.df_filtered)
         fig_org_total = visualizations.plot_org_total_bytes(df_org_bytes)
         if fig_org_total:
             st.plotly_chart(fig_org_total, use_container_width=True)
@@ -185,7 +213,7 @@ class DashboardApp:
         st.header("Análise Temporal")
 
         # Gráfico: Evolução do Total de Bytes por Ano
-        df_bytes_year = data_handler.get_bytes_per_year(self.df_filtered)
+        df_bytes_year = self._get_view_aggregate('bytes_per_year', data_handler.get_bytes_per_year, self.df_filtered)
         fig_bytes_trend = visualizations.plot_bytes_trend(df_bytes_year)
         if fig_bytes_trend:
             st.plotly_chart(fig_bytes_trend, use_container_width=True)
@@ -194,16 +222,16 @@ class DashboardApp:
 
         # Gráfico: Evolução das Top N Linguagens por Ano (Área Empilhada)
         st.subheader(f"Distribuição das Linguagens ao Longo do Tempo")
-        df_top_langs = data_handler.get_top_languages_overall(self.df_filtered, top_n)
+        df_top_langs = self._get_view_aggregate('top_languages', data_handler.get_top_languages_overall, self.df_filtered, top_n)
         top_n_lang_names = df_top_langs['Language'].tolist() if not df_top_langs.empty else []
-        df_lang_trends = data_handler.get_language_trends_over_time(self.df_filtered, top_n_lang_names)
+        df_lang_trends = self._get_view_aggregate('language_trends', data_handler.get_language_trends_over_time, self.df_filtered, top_n_lang_names)
         fig_lang_trends = visualizations.plot_language_trends(df_lang_trends, top_n, top_n_lang_names)
         if fig_lang_trends:
             st.plotly_chart(fig_lang_trends, use_container_width=True)
         else:
             st.write("Nenhum dado para o gráfico de Evolução das Linguagens.")
 
-    def _render_tab_organizacoes(self, selected_orgs, top_n):
+    def _render_tab_organizacoes(self, selected_orgs, selected_years, top_n):
         """Renderiza o conteúdo da aba 'Organizações'."""
         st.header("Análise por Organização")
 
@@ -213,30 +241,30 @@ class DashboardApp:
                 with org_tabs[i]:
                     st.subheader(f"Perfil de {org}")
                     df_org = self.df_filtered[self.df_filtered['Organization'] == org]
-                    self._render_org_details(df_org, org, top_n)
+                    self._render_org_details(df_org, org, selected_years, top_n)
         else:
             for org in selected_orgs:
                 st.subheader(f"Perfil de {org}")
                 df_org = self.df_filtered[self.df_filtered['Organization'] == org]
                 col1, col2 = st.columns(2)
                 with col1:
-                    df_org_year_data = data_handler.get_org_bytes_per_year(df_org)
+                    df_org_year_data = self._get_org_aggregate(org, selected_years, top_n, 'bytes_per_year', data_handler.get_org_bytes_per_year, df_org)
                     fig_org_trend = visualizations.plot_org_trend(df_org_year_data, org)
                     if fig_org_trend: st.plotly_chart(fig_org_trend, use_container_width=True)
                 with col2:
-                    df_top_langs_org = data_handler.get_top_languages_for_org(df_org, top_n)
+                    df_top_langs_org = self._get_org_aggregate(org, selected_years, top_n, 'top_languages', data_handler.get_top_languages_for_org, df_org, top_n)
                     fig_org_langs = visualizations.plot_org_top_languages(df_top_langs_org, org, top_n)
                     if fig_org_langs: st.plotly_chart(fig_org_langs, use_container_width=True)
 
-    def _render_org_details(self, df_org, org_name, top_n):
+    def _render_org_details(self, df_org, org_name, selected_years, top_n):
         """Renderiza os gráficos de detalhes para uma única organização (usado na aba 'Organizações')."""
         # Gráfico de tendência temporal
-        df_org_year_data = data_handler.get_org_bytes_per_year(df_org)
+        df_org_year_data = self._get_org_aggregate(org_name, selected_years, top_n, 'bytes_per_year', data_handler.get_org_bytes_per_year, df_org)
         fig_org_trend = visualizations.plot_org_trend(df_org_year_data, org_name)
         if fig_org_trend: st.plotly_chart(fig_org_trend, use_container_width=True)
 
         # Top linguagens
-        df_top_langs_org = data_handler.get_top_languages_for_org(df_org, top_n)
+        df_top_langs_org = self._get_org_aggregate(org_name, selected_years, top_n, 'top_languages', data_handler.get_top_languages_for_org, df_org, top_n)
         fig_org_langs = visualizations.plot_org_top_languages(df_top_langs_org, org_name, top_n)
         if fig_org_langs: st.plotly_chart(fig_org_langs, use_container_width=True)
 
@@ -272,6 +300,8 @@ class DashboardApp:
 
         if self.df_full is not None and selected_orgs: # tem dados e algum org?
             self.df_filtered = data_handler.filter_data(self.df_full, selected_orgs, selected_years)
+            if self.warm_cache is not None:
+                self.view_cache = self.warm_cache['views'].get(aggregate_cache.make_view_key(selected_orgs, selected_years, top_n))
 
             if not self.df_filtered.empty:
                 self._render_kpis() 
@@ -281,7 +311,7 @@ class DashboardApp:
 
                 with tab1: self._render_tab_visao_geral(top_n)
                 with tab2: self._render_tab_analise_temporal(top_n)
-                with tab3: self._render_tab_organizacoes(selected_orgs, top_n) 
+                with tab3: self._render_tab_organizacoes(selected_orgs, selected_years, top_n) 
                 with tab4: self._render_tab_dados_brutos()
                 with tab5: self._render_tab_sobre()
 
@@ -45,16 +45,22 @@ def load_data():
         st.error(f"Erro: Arquivo '{CSV_FILE}' não encontrado.")
         return None
     try:
-        df = pd.read_csv(CSV_FILE)
-        df['Organization'] = df['Organization'].replace(PADRONIZACAO_NOMES)
-        df['Year'] = pd.to_numeric(df['Year'], errors='coerce')
-        df.dropna(subset=['Year'], inplace=True) 
-        df['Year'] = df['Year'].astype(int)
-        return df
+        return prepare_data(pd.read_csv(CSV_FILE))
     except Exception as e:
         st.error(f"Erro ao carregar ou processar o arquivo CSV: {e}")
         return None
 
+def prepare_data(df):
+    """
+    Aplica a padronização de nomes e o tratamento de tipos a um DataFrame
+    bruto lido do CSV. Não depende do Streamlit (usado também pelo aggregate_cache).
+    """
+    df['Organization'] = df['Organization'].replace(PADRONIZACAO_NOMES)
+    df['Year'] = pd.to_numeric(df['Year'], errors='coerce')
+    df.dropna(subset=['Year'], inplace=True) 
+    df['Year'] = df['Year'].astype(int)
+    return df
+
 def filter_data(df, selected_orgs, selected_years):
     """
     Filtra o DataFrame com base nas organizações e anos selecionados.
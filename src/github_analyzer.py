@@ -1,19 +1,54 @@
 # ---
 
 import os
+import sys
+import json
 import time
+import signal
+import argparse
+import threading
 import requests
 import logging
 import pandas as pd
 import matplotlib
 import matplotlib.pyplot as plt
-from datetime import datetime
+from datetime import datetime, timezone
 
 # --- 
 
 matplotlib.use('Agg')  #! backend Agg para evitar erros de interface gráfica
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+REQUEST_TIMEOUT = 30              # timeout de cada requisição HTTP (s)
+
+# --- constantes do modo daemon
+
+RATE_LIMIT_RESERVE = 50           # requisições mantidas em reserva (mesma margem do _make_request)
+MIN_REQUEST_INTERVAL = 0.5        # pausa mínima entre requisições (s)
+ORG_REFRESH_INTERVAL = 6 * 3600   # intervalo para relistar os repositórios de uma organização (s)
+MAX_STALENESS = 7 * 24 * 3600     # repositórios sem push são recoletados após este tempo (s)
+PUSH_ACTIVITY_WEIGHT = 10         # peso extra para repositórios com push recente desde a última coleta
+IDLE_INTERVAL = 300               # espera quando não há tarefas elegíveis (s)
+FAILURE_BACKOFF = 15 * 60         # espera base após uma falha de coleta, dobrada a cada falha seguida (s)
+QUEUE_SAVE_INTERVAL = 60          # intervalo mínimo entre salvamentos da fila durante um lote (s)
+
+# ---
+def _parse_github_date(value):
+    """Converte uma data da API do GitHub (ISO 8601, UTC) em datetime com timezone."""
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+
+def _warm_aggregate_cache(csv_file):
+    """
+    Pré-aquece o cache de agregações do dashboard para o CSV informado. O cache é
+    gravado ao lado do CSV e só é lido pelo dashboard se ambos estiverem em src/data/.
+    """
+    try:
+        import aggregate_cache #! import tardio: depende do streamlit via data_handler
+        cache_file = aggregate_cache.build_cache(csv_file)
+        logging.info(f"Para o dashboard utilizar o cache, mova '{csv_file}' e '{cache_file}' juntos para src/data/.")
+    except Exception as e: #! etapa opcional: falhas (import, CSV vazio, escrita) não devem interromper a coleta
+        logging.warning(f"Cache de agregações não gerado ({e}). Execute 'python aggregate_cache.py' em src/.")
+
 # ---
 class GithubAnalyzer:
     def __init__(self, github_token=None):
@@ -23,40 +58,59 @@ class GithubAnalyzer:
         else:
             logging.warning("Nenhum token do GitHub fornecido. Operando com limites de taxa anônimos.")
         self.base_url = 'https://api.github.com'
+        self.rate_remaining = None
+        self.rate_reset = None
+        self._stop_event = threading.Event()
 
     def _make_request(self, url, params=None):
-        """Faz uma requisição à API do GitHub com tratamento de erros e limites de taxa."""
+        """
+        Faz uma requisição à API do GitHub com tratamento de erros e limites de taxa.
+        As esperas são interrompidas por stop(), permitindo o encerramento gracioso do daemon.
+        """
         for attempt in range(3):  # até 3 vezes em caso de falha
+            if self._stop_event.is_set():
+                return None
             try:
                 logging.info(f"Fazendo requisição para: {url}")
-                response = requests.get(url, headers=self.headers, params=params)
+                response = requests.get(url, headers=self.headers, params=params, timeout=REQUEST_TIMEOUT)
                 response.raise_for_status()
 
                 # verificar e aguardar se houver limites de taxa
                 remaining = int(response.headers.get('X-RateLimit-Remaining', 0))
                 reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
+                self.rate_remaining, self.rate_reset = remaining, reset_time
                 
                 if remaining < 50:  #! ajustado para 50 para mais margem
                     sleep_time = max(reset_time - time.time(), 0) + 1
                     logging.warning(f"Limite de taxa baixo ({remaining}). Aguardando {sleep_time:.1f}s.")
-                    time.sleep(sleep_time)
+                    self._stop_event.wait(sleep_time)
 
                 logging.info("Requisição bem-sucedida.")
                 return response.json()
             except requests.exceptions.RequestException as e:
                 logging.error(f"Erro na requisição (tentativa {attempt+1}/3): {e}")
-                time.sleep(2 ** attempt)  #! pausa com tempo exponencial .. 2⁰ = 1 seg, 2¹ = 2 seg...
+                self._stop_event.wait(2 ** attempt)  #! pausa com tempo exponencial .. 2⁰ = 1 seg, 2¹ = 2 seg...
         logging.error("Falha após 3 tentativas.")
         return None
 
     def get_user_repos(self, username, per_page=100):
         """Obtém todos os repositórios de uma organização, lidando com paginação."""
+        repos, _ = self._list_user_repos(username, per_page)
+        return repos
+
+    def _list_user_repos(self, username, per_page=100):
+        """
+        Lista os repositórios de uma organização. Retorna (repos, completo), onde
+        completo é False se alguma página falhou e a lista pode estar parcial.
+        """
         repos = []
         page = 1
         while True:
             url = f"{self.base_url}/orgs/{username}/repos"
             params = {'per_page': per_page, 'page': page, 'sort': 'created', 'direction': 'asc'}
             data = self._make_request(url, params)
+            if data is None:
+                return repos, False
             if not data:
                 break
             # filtrar repositórios não arquivados e não forks
@@ -65,8 +119,9 @@ class GithubAnalyzer:
             if len(data) < per_page:
                 break
             page += 1
-            time.sleep(0.5)  # evitar atingir limite de taxa
-        return repos
+            if self._stop_event.wait(0.5):  # evitar atingir limite de taxa
+                return repos, False
+        return repos, True
 
     def get_repo_languages(self, username, repo_name):
         """Obtém as linguagens usadas em um repositório."""
@@ -114,6 +169,233 @@ class GithubAnalyzer:
 
         return languages_by_year
 
+    # --- modo daemon: fila persistente de tarefas (org, repo) priorizada por defasagem
+
+    def get_rate_limit(self):
+        """Consulta o limite de taxa atual (o endpoint /rate_limit não consome cota)."""
+        data = self._make_request(f"{self.base_url}/rate_limit")
+        if data:
+            core = data.get('resources', {}).get('core', {})
+            self.rate_remaining = int(core.get('remaining', 0))
+            self.rate_reset = int(core.get('reset', 0))
+        return self.rate_remaining, self.rate_reset
+
+    def stop(self, *args):
+        """Solicita o encerramento gracioso do daemon (também usado como handler de sinais)."""
+        logging.info("Encerramento solicitado. Finalizando após a tarefa atual...")
+        self._stop_event.set()
+
+    def load_queue(self, queue_file):
+        """
+        Carrega a fila persistente do disco, ou cria uma vazia. Um arquivo corrompido
+        é movido para '<queue_file>.corrupt' e a fila é recriada do zero.
+        """
+        empty_queue = {'orgs': {}, 'tasks': {}, 'completed_orgs': []}
+        try:
+            with open(queue_file, encoding='utf-8') as f:
+                queue = json.load(f)
+            if not isinstance(queue.get('orgs'), dict) or not isinstance(queue.get('tasks'), dict):
+                raise ValueError("estrutura da fila inválida")
+            logging.info(f"Fila carregada de {queue_file} ({len(queue['tasks'])} tarefas).")
+            queue.setdefault('completed_orgs', []) # filas salvas antes deste campo existir
+            return queue
+        except FileNotFoundError:
+            logging.info("Nenhuma fila existente encontrada. Iniciando do zero.")
+            return empty_queue
+        except Exception as e:
+            logging.warning(f"Não foi possível ler a fila {queue_file}: {e}. Movendo para {queue_file}.corrupt e iniciando do zero.")
+            os.replace(queue_file, f"{queue_file}.corrupt")
+            return empty_queue
+
+    def save_queue(self, queue, queue_file):
+        """Salva a fila no disco de forma atômica (arquivo temporário + rename)."""
+        tmp_file = f"{queue_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(queue, f)
+        os.replace(tmp_file, queue_file)
+
+    def refresh_org_tasks(self, org, queue):
+        """Relista os repositórios de uma organização, atualizando as datas de push e adicionando/removendo tarefas."""
+        logging.info(f"Atualizando lista de repositórios de {org}")
+        repos, complete = self._list_user_repos(org)
+        if not repos:
+            logging.warning(f"Nenhum repositório encontrado para {org}")
+        tasks = queue['tasks']
+        current = set()
+        for repo in repos:
+            created_at = repo.get('created_at', '')
+            if not created_at:
+                continue
+            key = f"{org}/{repo['name']}"
+            current.add(key)
+            task = tasks.setdefault(key, {
+                'org': org,
+                'repo': repo['name'],
+                'year': _parse_github_date(created_at).year,
+                'last_collected': None,
+                'languages': None
+            })
+            pushed_at = repo.get('pushed_at')
+            task['pushed_at'] = _parse_github_date(pushed_at).timestamp() if pushed_at else None
+        if not complete:
+            # listagem parcial: não remove tarefas nem marca a organização como atualizada
+            logging.warning(f"Listagem de {org} incompleta. Remoção de tarefas adiada para a próxima tentativa.")
+            return
+        # repositórios removidos, arquivados ou transformados em fork saem da fila
+        for key in [k for k, t in tasks.items() if t['org'] == org and k not in current]:
+            del tasks[key]
+        queue['orgs'][org] = time.time()
+
+    def _task_priority(self, task, now):
+        """
+        Calcula a prioridade de uma tarefa: tarefas nunca coletadas primeiro; as demais
+        pela defasagem, multiplicada por um peso quando houve push desde a última coleta
+        (quanto mais recente o push, maior o peso).
+        """
+        if task['last_collected'] is None:
+            return float('inf')
+        staleness = now - task['last_collected']
+        pushed_at = task.get('pushed_at')
+        if pushed_at and pushed_at > task['last_collected']:
+            days_since_push = max(now - pushed_at, 0) / 86400
+            staleness *= 1 + PUSH_ACTIVITY_WEIGHT / (1 + days_since_push)
+        return staleness
+
+    def _is_task_due(self, task, now):
+        """
+        Uma tarefa é elegível se nunca foi coletada, teve push desde a última coleta ou está
+        defasada demais. Tarefas com falhas recentes aguardam um backoff exponencial.
+        """
+        failures = task.get('failures', 0)
+        if failures:
+            backoff = min(FAILURE_BACKOFF * 2 ** (failures - 1), MAX_STALENESS)
+            if now - task['last_attempt'] < backoff:
+                return False
+        if task['last_collected'] is None:
+            return True
+        pushed_at = task.get('pushed_at')
+        if pushed_at and pushed_at > task['last_collected']:
+            return True
+        return now - task['last_collected'] >= MAX_STALENESS
+
+    def _queue_to_records(self, queue, legacy_records):
+        """
+        Converte a fila em registros no formato do CSV. Uma organização está completa
+        quando todas as suas tarefas têm linguagens coletadas com sucesso. Registros
+        antigos (da coleta única) são usados apenas para organizações que o daemon nunca
+        coletou por completo; depois disso, as tarefas já coletadas da organização são sempre
+        emitidas, mesmo que uma nova listagem traga repositórios ainda não coletados.
+        """
+        records = []
+        complete_orgs = set(queue['orgs'])
+        for task in queue['tasks'].values():
+            if task['languages'] is None:
+                complete_orgs.discard(task['org'])
+        queue['completed_orgs'] = sorted(set(queue['completed_orgs']) | complete_orgs)
+        daemon_orgs = set(queue['completed_orgs'])
+        records.extend(r for r in legacy_records if r['Organization'] not in daemon_orgs)
+        for task in queue['tasks'].values():
+            if task['org'] not in daemon_orgs or not task['languages']:
+                continue
+            for lang, bytes_count in task['languages'].items():
+                records.append({
+                    'Organization': task['org'],
+                    'Year': task['year'],
+                    'Language': lang,
+                    'Bytes': bytes_count
+                })
+        return records
+
+    def _flush(self, queue, queue_file, legacy_records, csv_file):
+        """Persiste a fila e regrava o CSV (e o cache de agregações do dashboard)."""
+        records = self._queue_to_records(queue, legacy_records) # também atualiza completed_orgs
+        self.save_queue(queue, queue_file)
+        if not records:
+            return
+        self.save_to_csv(records, csv_file)
+        _warm_aggregate_cache(csv_file)
+
+    def run_daemon(self, organizations, queue_file='collection_queue.json', csv_file='languages_by_year.csv'):
+        """
+        Executa a coleta continuamente até receber SIGINT/SIGTERM. A cada ciclo: relista
+        as organizações com lista vencida, consulta o limite de taxa e coleta as tarefas
+        elegíveis mais prioritárias, espaçando as requisições para caber na cota até o reset.
+        A fila é salva periodicamente, ao final de cada lote e no encerramento, permitindo
+        retomar de onde parou.
+        """
+        queue = self.load_queue(queue_file)
+        try:
+            legacy_records = pd.read_csv(csv_file).to_dict('records')
+        except FileNotFoundError:
+            legacy_records = []
+
+        self._stop_event.clear()
+        previous_handlers = {sig: signal.signal(sig, self.stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            while not self._stop_event.is_set():
+                now = time.time()
+                for org in organizations:
+                    if self._stop_event.is_set():
+                        break
+                    if now - queue['orgs'].get(org, 0) >= ORG_REFRESH_INTERVAL:
+                        self.refresh_org_tasks(org, queue)
+                        self.save_queue(queue, queue_file)
+                if self._stop_event.is_set():
+                    break
+
+                remaining, reset_time = self.get_rate_limit()
+                if remaining is None:
+                    self._stop_event.wait(IDLE_INTERVAL)
+                    continue
+                budget = remaining - RATE_LIMIT_RESERVE
+                if budget <= 0:
+                    wait = max(reset_time - time.time(), 0) + 1
+                    logging.warning(f"Cota esgotada ({remaining}). Aguardando {wait:.1f}s até o reset.")
+                    self._stop_event.wait(wait)
+                    continue
+
+                now = time.time()
+                due = [t for t in queue['tasks'].values() if t['org'] in organizations and self._is_task_due(t, now)]
+                if not due:
+                    logging.info(f"Nenhuma tarefa elegível. Aguardando {IDLE_INTERVAL}s.")
+                    self._stop_event.wait(IDLE_INTERVAL)
+                    continue
+                due.sort(key=lambda t: (self._task_priority(t, now), t.get('pushed_at') or 0), reverse=True)
+                batch = due[:budget]
+                interval = max(MIN_REQUEST_INTERVAL, (reset_time - now) / budget)
+                logging.info(f"Coletando {len(batch)} de {len(due)} tarefas elegíveis (cota: {budget}, intervalo: {interval:.1f}s).")
+
+                processed = 0
+                last_save = time.time()
+                for task in batch:
+                    if self._stop_event.is_set():
+                        break
+                    languages = self.get_repo_languages(task['org'], task['repo'])
+                    if self._stop_event.is_set():
+                        break # requisição interrompida: a tarefa fica intacta e é refeita na retomada
+                    if languages is not None:
+                        task['languages'] = languages
+                        task['last_collected'] = time.time()
+                        task['failures'] = 0
+                    else:
+                        # falha não conta como coleta; o backoff evita consumir a cota a cada ciclo
+                        task['failures'] = task.get('failures', 0) + 1
+                        task['last_attempt'] = time.time()
+                        logging.warning(f"Falha ao coletar {task['org']}/{task['repo']} ({task['failures']}ª seguida).")
+                    processed += 1
+                    if time.time() - last_save >= QUEUE_SAVE_INTERVAL:
+                        self.save_queue(queue, queue_file)
+                        last_save = time.time()
+                    self._stop_event.wait(interval)
+
+                if processed:
+                    self._flush(queue, queue_file, legacy_records, csv_file)
+        finally:
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)
+            self.save_queue(queue, queue_file)
+            logging.info(f"Daemon encerrado. Fila salva em {queue_file}.")
+
     def save_to_csv(self, languages_by_year, filename='languages_by_year.csv'):
         """Salva os dados de linguagens por ano em um arquivo CSV."""
         df = pd.DataFrame(languages_by_year)
@@ -161,17 +443,31 @@ class GithubAnalyzer:
 
 # --- testes
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coleta linguagens de programação de organizações do GitHub.")
+    parser.add_argument('--daemon', action='store_true',
+                        help="executa continuamente com fila persistente priorizada por defasagem")
+    parser.add_argument('--queue-file', default='collection_queue.json',
+                        help="arquivo da fila persistente do modo daemon")
+    args = parser.parse_args()
+
     github_token = os.environ.get('GITHUB_TOKEN')
     analyzer = GithubAnalyzer(github_token)
 
     # empresas
     organizations = ['microsoft','APPLE','nvidia','facebook','amzn','netflix','google','uber']
 
+    if args.daemon:
+        analyzer.run_daemon(organizations, queue_file=args.queue_file)
+        sys.exit(0)
+
     # coletar
     languages_by_year = analyzer.collect_languages_by_year(organizations)
 
     # persistir
     analyzer.save_to_csv(languages_by_year)
 
+    # pré-aquecer o cache de agregações do dashboard
+    _warm_aggregate_cache('languages_by_year.csv')
+
     # visualizar
-    analyzer.plot_languages_by_year(languages_by_year, top_n=5)
\ No newline at end of file
+    analyzer.plot_languages_by_year(languages_by_year, top_n=5)